@@ -5,14 +5,121 @@ COMMUNICATIONS BASED ON SOCKETS
 (c) Juan-Antonio Fernández-Madrigal, 2025
 https://babel.isa.uma.es/jafma
 
+Wire format: every message is a 4-byte network-order length followed by a
+1-byte serializer marker and the payload, which is msgpack when available
+(C-accelerated, compact) and pickle protocol 5 otherwise; raw caller-encoded
+payloads bypass deserialization entirely (see sendRaw()).
+
 """
 
 from enum import Enum
+import io
 import ipaddress
+import os
+import sys
 import time
 import datetime
-import socket,pickle,select
-from typing import Dict,List,Tuple
+import socket,pickle,selectors,struct,threading
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Dict,List
+
+try:
+	import msgpack
+except ImportError: # msgpack is optional; pickle is used when not installed
+	msgpack = None
+try:
+	import numpy
+except ImportError: # numpy is optional; only needed for array payloads
+	numpy = None
+
+
+# -----------------------------------------------------------------------------
+#
+#	Wire format helpers
+#
+# -----------------------------------------------------------------------------
+
+# first byte of every serialized payload identifies the serializer used
+_FMT_MSGPACK = 0
+_FMT_PICKLE = 1
+
+_FMT_RAW = 2 # payload encoded by the caller (see sendRaw()); not deserialized
+
+# the format markers as ready-made wire parts, so marker and payload can
+# travel as separate iovecs of one sendmsg call instead of being
+# concatenated in user space
+_MARK_MSGPACK = bytes([_FMT_MSGPACK])
+_MARK_RAW = bytes([_FMT_RAW])
+
+# precompiled 4-byte network-order length prefix of every message
+_LEN_STRUCT = struct.Struct("!I")
+
+# length-prefix value reserved to mean "payload is in shared memory"; the
+# actual (offset,length) token follows on the socket
+_SHM_SENTINEL = 0xFFFFFFFF
+_SHM_TOKEN_STRUCT = struct.Struct("!II")
+
+# msgpack extension code for numpy arrays
+_EXT_NDARRAY = 1
+
+# Linux zero-copy sends (kernel 4.14+); the constants are not exposed by the
+# socket module, and sends below the threshold are not worth the page pinning
+_SO_ZEROCOPY = 60
+_MSG_ZEROCOPY = 0x4000000
+_MSG_ERRQUEUE = getattr(socket,"MSG_ERRQUEUE",0x2000)
+_ZEROCOPY_MIN = 16384
+# struct sock_extended_err of the completion notifications: ee_errno,
+# ee_origin, ee_type, ee_code, ee_pad, ee_info (first completed zero-copy
+# sequence number), ee_data (last one)
+_EXT_ERR_STRUCT = struct.Struct("=IBBBBII")
+# the error queue also carries ICMP-origin errors (PMTU, unreachable...);
+# only messages with this origin are zero-copy completions
+_SO_EE_ORIGIN_ZEROCOPY = 5
+_SOL_IP = getattr(socket,"SOL_IP",0)
+_IP_RECVERR = getattr(socket,"IP_RECVERR",11)
+
+
+def _msgpackDefault(obj):
+	"""
+	Encode objects that msgpack does not know natively (numpy arrays).
+	"""
+	if numpy is not None and isinstance(obj,numpy.ndarray):
+		return msgpack.ExtType(_EXT_NDARRAY,
+							   msgpack.packb((obj.dtype.str,obj.shape,
+											  obj.tobytes()),
+											 use_bin_type = True))
+	raise TypeError("Cannot msgpack-serialize object of {}".format(type(obj)))
+
+
+def _msgpackExtHook(code,data):
+	"""
+	Decode the extension types produced by _msgpackDefault().
+	"""
+	if code == _EXT_NDARRAY and numpy is not None:
+		dtypestr,shape,raw = msgpack.unpackb(data,raw = False)
+		return numpy.frombuffer(raw,dtype = dtypestr).reshape(shape)
+	return msgpack.ExtType(code,data)
+
+
+class CommError(Exception):
+	"""
+	Error in the communications: connection refused or closed, timeout,
+	unreachable peer, etc. Raised by the comm point operations instead of
+	returning error strings, so the no-error case costs nothing per call.
+	"""
+	pass
+
+
+def _unixSocketName(port: int) -> str:
+	"""
+	Name of the AF_UNIX socket used for a given PORT. On Linux this is in the
+	abstract namespace (no filesystem entry, nothing to clean up); elsewhere
+	a /tmp path is used.
+	"""
+	if sys.platform.startswith("linux"):
+		return "\0rl_spin_{}".format(port)
+	return "/tmp/rl_spin_{}.sock".format(port)
 
 
 # -----------------------------------------------------------------------------
@@ -25,6 +132,11 @@ from typing import Dict,List,Tuple
 class BaseCommPoint:
 	"""
 	Communication point.
+	A point belongs to a single thread: the hot paths are raw blocking
+	socket calls with no Python-level locking, which is only sound because
+	exactly one thread ever touches the socket. The first thread that sends
+	or reads becomes the owner and any use from another thread raises
+	RuntimeError (ownership is reset when a new connection is set up).
 	"""
 
 	class Kind(Enum):
@@ -35,8 +147,22 @@ class BaseCommPoint:
 		CLIENT = 1	
 
 
+	_cached_ip = None # result of the UDP probe in get_ip(), done only once
+
 	@classmethod
 	def get_ip(cls):
+		"""
+		IPv4 of this machine, cached after the first call (the UDP probe it
+		needs is pure repeated work otherwise). Setting the environment
+		variable RL_SPIN_LOCAL=1 skips the probe and returns the loopback
+		address, for loopback-only runs. Use invalidate_ip() to force a
+		refresh after a network change.
+		"""
+		if cls._cached_ip is not None:
+			return cls._cached_ip
+		if os.environ.get("RL_SPIN_LOCAL") == "1":
+			cls._cached_ip = '127.0.0.1'
+			return cls._cached_ip
 		s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 		s.settimeout(0)
 		try:
@@ -47,106 +173,599 @@ class BaseCommPoint:
 			IP = '127.0.0.1'
 		finally:
 			s.close()
-		return IP		
-		
+		cls._cached_ip = IP
+		return IP
+
+	@classmethod
+	def invalidate_ip(cls):
+		"""
+		Forget the cached machine IP so the next get_ip() probes again.
+		"""
+		cls._cached_ip = None
+
+
 	
-	def __init__(self, kind: Kind , datachunkmaxsize: int = 4096, port: int = 49054, ipv4: str = "127.0.0.1"):
+	def __init__(self, kind: Kind , datachunkmaxsize: int = 4096, port: int = 49054, ipv4: str = "127.0.0.1", transport: str = "inet", shmsize: int = 0, sockbufsize: int = 65536):
 		"""
 		Constructor. The point is set at the given port and machine IPv4.
+		DATACHUNKMAXSIZE is the initial capacity of the reusable receive
+		buffer; it grows automatically if larger messages arrive.
+		TRANSPORT is "inet" for TCP or "unix" for AF_UNIX stream sockets;
+		the latter skips the loopback TCP/IP stack (checksums, ACKs, Nagle)
+		and roughly halves the latency when both sides run on the same
+		machine (both must use the same transport).
+		SHMSIZE > 0 enables a shared-memory fast path for payloads (only for
+		points on the same machine): message bodies are written to a shared
+		memory region of that many bytes per direction and the socket only
+		carries a small ready token; both sides must use the same SHMSIZE.
+		SOCKBUFSIZE is the kernel send/receive buffer size requested for the
+		data socket. The default suits small observation dicts; when messages
+		carry large tensors over a real network, size it to at least the
+		bandwidth-delay product of the link (and at least one whole message)
+		or the sender will stall on flow control in RTT-spaced chunks.
 		"""
 		if not isinstance(kind,BaseCommPoint.Kind):
 			raise(TypeError("Expected a Kind argument, got {}".format(type(kind))))
 		if (not isinstance(datachunkmaxsize, int)) or not (0 < datachunkmaxsize):
-			raise(ValueError("The max. size of data chunks {} is invalid".format(datachunkmaxsize)))			
+			raise(ValueError("The max. size of data chunks {} is invalid".format(datachunkmaxsize)))
 		if (not isinstance(port, int)) or not (20000 <= port <= 49151):
-			raise(ValueError("Port {} is invalid; it should be an integer between 20000 and 49151".format(port)))			
+			raise(ValueError("Port {} is invalid; it should be an integer between 20000 and 49151".format(port)))
 		try:
 			ipaddress.IPv4Address(ipv4)
 		except ipaddress.AddressValueError:
 			raise(ValueError("IP address {} is invalid".format(ipv4)))
-			
+		if transport not in ("inet","unix"):
+			raise(ValueError("Transport {} is invalid; it should be \"inet\" or \"unix\"".format(transport)))
+		if (not isinstance(shmsize, int)) or shmsize < 0:
+			raise(ValueError("Shared memory size {} is invalid".format(shmsize)))
+		if (not isinstance(sockbufsize, int)) or sockbufsize <= 0:
+			raise(ValueError("Socket buffer size {} is invalid".format(sockbufsize)))
+
 		self._kind = kind
+		self._sockbufsize = sockbufsize
+		self._transport = transport
+		self._shmsize = shmsize
+		self._shm_tx = None # shared memory regions, set in _setupSharedMemory()
+		self._shm_rx = None
+		self._shm_tx_idx = 0 # which half of the tx region to write next
 		self._datachunkmaxsize = datachunkmaxsize
 		self._port = port
 		self._ipv4 = ipv4
 		self._begun = False # to be set in derived classes
 		self._debug = False
+		self._log = BaseCommPoint._noLog # see setDebug()
+		self._quickack = False # set in _configDataSocket()
+		# reusable receive buffer; sized so one recv can pull several pending
+		# frames out of the kernel at once (see _recvExact())
+		self._rdcap_min = max(datachunkmaxsize,BaseCommPoint._SOCKBUFSIZE)
+		self._recv_buf = bytearray(self._rdcap_min)
+		self._rd_start = 0 # unconsumed received bytes live in
+		self._rd_end = 0 # _recv_buf[_rd_start:_rd_end]
+		self._recv_hw = 0 # high-water mark of received sizes (see _recvExact)
+		self._recv_count = 0
+		self._len_buf = bytearray(_LEN_STRUCT.size) # reused length prefix
+		self._sel = None # persistent selector, set in _configDataSocket()
+		self._sock_sendmsg = None # hot socket methods pre-bound in
+		self._sock_recv_into = None # _configDataSocket() to skip the
+									# attribute lookups per message
+		self._pickler = None # reusable pickler and its stream/buffer state,
+		self._pickle_io = None # set up lazily by _serialize() for the
+		self._pickle_oob = [] # pickle fallback path
+		self._zerocopy = False # set in _configDataSocket()
+		self._zc_seq = -1 # sequence number of the last zero-copy send
+		self._zc_pending = deque() # buffers awaiting completion notification
+		self._owner_tid = None # thread owning the point (see _assertOwner())
 		
 	def __copy__(self):
 		"""
 		Prevent to make copies or deepcopies.
 		"""
 		raise NotImplementedError("Cannot do copies of CommPoint")
+
+	@property
+	def sock(self):
+		"""
+		The underlying connected socket (None before begin()), for callers
+		that need to tune options beyond what _configDataSocket() sets.
+		"""
+		return self._sock if self._begun else None
 		
-	def _printInfo(self,info:str):
+	def _printInfo(self,info:str,*args):
+		if not self._debug: # no-op unless debugging, whoever the caller is
+			return
+		if args: # printf-style: the message is only built when printed
+			info = info % args
 		now = datetime.datetime.now()
 		print("CommPoint[" + str(now) + "]: " + info,flush=True)
-		
+
+	@staticmethod
+	def _noLog(*_):
+		pass
+
 	def setDebug(self,st:bool = True):
 		"""
 		Enable or disable debug messages.
 		"""
 		self._debug = st
+		# cached logging callable: the real printer when debugging, a no-op
+		# otherwise, so the hot paths pay one cheap call either way instead
+		# of formatting strings that nobody will see
+		self._log = self._printInfo if st else BaseCommPoint._noLog
+
+	# default kernel buffer size for the data socket (see the sockbufsize
+	# constructor argument); enough for typical observation dicts so a whole
+	# message fits without flow-control stalls
+	_SOCKBUFSIZE = 65536
+
+	def _configDataSocket(self):
+		"""
+		Tune the connected data socket for the small request/response messages
+		of the step protocol: disable Nagle (it would hold each tiny send
+		until the peer delayed ACK arrives, up to 40 ms per round trip),
+		enable keepalive and size the kernel buffers to the expected
+		messages. Also register the socket in a persistent selector, reused
+		by every readiness test instead of rebuilding fd sets per call.
+		The TCP options are only meaningful on TCP; AF_UNIX needs none.
+		"""
+		if self._sel is not None:
+			self._sel.close()
+		self._sel = selectors.DefaultSelector()
+		self._sel.register(self._sock,selectors.EVENT_READ)
+		self._sock_sendmsg = self._sock.sendmsg
+		self._sock_recv_into = self._sock.recv_into
+		self._sock.settimeout(None) # blocking once and for all; read
+									# timeouts go through the selector
+		self._quickack = False
+		self._zerocopy = False
+		self._zc_seq = -1
+		self._zc_pending.clear()
+		self._rd_start = 0 # drop any bytes buffered from a previous connection
+		self._rd_end = 0
+		self._owner_tid = None # a new connection may get a new owner thread
+		if self._sock.family != socket.AF_INET:
+			return
+		if sys.platform.startswith("linux"):
+			try:
+				self._sock.setsockopt(socket.SOL_SOCKET,_SO_ZEROCOPY,1)
+				self._zerocopy = True
+			except OSError:
+				pass # kernel without MSG_ZEROCOPY support
+		self._sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+		self._sock.setsockopt(socket.SOL_SOCKET,socket.SO_KEEPALIVE,1)
+		# aggressive keepalive timing (Linux): probe an idle peer after 5 s,
+		# every 2 s, give up after 3 failures, so a dead peer surfaces as a
+		# comm error in ~11 s instead of the 2-hour kernel default
+		if hasattr(socket,"TCP_KEEPIDLE"):
+			self._sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_KEEPIDLE,5)
+		if hasattr(socket,"TCP_KEEPINTVL"):
+			self._sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_KEEPINTVL,2)
+		if hasattr(socket,"TCP_KEEPCNT"):
+			self._sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_KEEPCNT,3)
+		# no SO_LINGER(1,0) here: an RST close would let BSD/macOS/Windows
+		# peers discard a FINISH still unread in their receive buffer (the
+		# RL side closes without any ack of it), and the TIME_WAIT concern
+		# is already handled by SO_REUSEADDR on the listener
+		self._sock.setsockopt(socket.SOL_SOCKET,socket.SO_SNDBUF,self._sockbufsize)
+		self._sock.setsockopt(socket.SOL_SOCKET,socket.SO_RCVBUF,self._sockbufsize)
+		self._quickack = hasattr(socket,"TCP_QUICKACK") # Linux only
+		if self._quickack:
+			self._sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_QUICKACK,1)
+
+	def _setupSharedMemory(self):
+		"""
+		Create or attach the shared-memory fast path right after the
+		connection is established (no-op unless shmsize > 0). The server
+		creates one region per direction and sends their names to the client
+		through the socket. Each region is split in two alternating slots so
+		the two back-to-back messages of the step protocol can be in flight
+		at once; payloads that do not fit in a slot transparently fall back
+		to the socket.
+		"""
+		if self._shmsize <= 0:
+			return
+		if self._kind == BaseCommPoint.Kind.SERVER:
+			tx = shared_memory.SharedMemory(create = True,size = self._shmsize)
+			rx = shared_memory.SharedMemory(create = True,size = self._shmsize)
+			# names swapped for the peer: our tx region is its rx one
+			self.sendData({"shm_tx": rx.name,"shm_rx": tx.name})
+			self._shm_tx,self._shm_rx = tx,rx
+		else:
+			setup = self.readData(10.0)
+			self._shm_tx = shared_memory.SharedMemory(name = setup["shm_tx"])
+			self._shm_rx = shared_memory.SharedMemory(name = setup["shm_rx"])
+		self._shm_tx_idx = 0
+
+	def _teardownSharedMemory(self):
+		"""
+		Release the shared-memory regions, unlinking them on the creator side.
+		"""
+		if self._shm_tx is None:
+			return
+		for shm in (self._shm_tx,self._shm_rx):
+			shm.close()
+			if self._kind == BaseCommPoint.Kind.SERVER:
+				try:
+					shm.unlink()
+				except FileNotFoundError:
+					pass # already gone
+		self._shm_tx = self._shm_rx = None
 					
-	def sendData(self, data: Dict) -> str:
+	def _serialize(self, data: Dict) -> List:
+		"""
+		Serialize DATA for the wire as a list of bytes-like parts ready for a
+		scatter-gather send. Msgpack is preferred for the small control dicts
+		exchanged here (much lower per-call overhead than the pickle VM);
+		pickle protocol 5 is the fallback when msgpack is not installed or
+		cannot encode the payload. The pickle path uses out-of-band buffers
+		(PEP 574) so ndarray payloads are sent as raw views without being
+		copied into the pickle stream; their sizes travel in a small framed
+		header. The first byte of the payload identifies the serializer.
+		"""
+		if msgpack is not None:
+			try:
+				return [_MARK_MSGPACK,
+						msgpack.packb(data,use_bin_type = True,
+									  default = _msgpackDefault)]
+			except (TypeError,ValueError):
+				pass # not msgpack-able; fall back to pickle
+		if self._pickler is None: # lazy: most traffic never needs pickle
+			self._pickle_io = io.BytesIO()
+			self._pickler = pickle.Pickler(self._pickle_io,protocol = 5,
+										   buffer_callback = self._pickle_oob.append)
+		# reuse the pickler across calls (creating one per message and its
+		# memo table dominates the cost for the small dicts sent here)
+		self._pickle_io.seek(0)
+		self._pickle_io.truncate()
+		self._pickle_oob.clear()
+		self._pickler.clear_memo()
+		self._pickler.dump(data)
+		blob = self._pickle_io.getvalue()
+		raws = [pb.raw() for pb in self._pickle_oob]
+		head = struct.pack("!BII{}I".format(len(raws)),
+						   _FMT_PICKLE,len(raws),len(blob),
+						   *(len(r) for r in raws))
+		return [head,blob] + raws
+
+	def _deserialize(self, buf) -> Dict:
+		"""
+		Deserialize a payload produced by _serialize() on the other side.
+		Payloads sent with sendRaw() come back verbatim as bytes instead.
+		"""
+		fmt = buf[0]
+		if fmt == _FMT_MSGPACK:
+			if msgpack is None:
+				raise RuntimeError("Received a msgpack payload but msgpack "
+								   "is not installed on this side")
+			return msgpack.unpackb(memoryview(buf)[1:],raw = False,
+								   ext_hook = _msgpackExtHook)
+		elif fmt == _FMT_RAW:
+			# copied out: the receive buffer is reused for the next message
+			return bytes(memoryview(buf)[1:])
+		elif fmt == _FMT_PICKLE:
+			mv = memoryview(buf)
+			nbufs,bloblen = struct.unpack_from("!II",mv,1)
+			off = 9
+			lens = struct.unpack_from("!{}I".format(nbufs),mv,off)
+			off += 4 * nbufs
+			blob = mv[off:off + bloblen]
+			off += bloblen
+			oob = []
+			for l in lens:
+				# copied: the receive buffer is reused for the next message,
+				# so reconstructed objects must not alias it
+				oob.append(bytes(mv[off:off + l]))
+				off += l
+			return pickle.loads(blob,buffers = oob)
+		else:
+			raise ValueError("Unknown wire format {}".format(fmt))
+
+	def _sendParts(self, parts: List) -> int:
+		"""
+		Send all PARTS through the socket with sendmsg (scatter-gather), so
+		header and payload go out in a single syscall without being
+		concatenated in user space. Return the total number of bytes sent.
+		"""
+		views = [memoryview(p) for p in parts]
+		total = sum(len(v) for v in views)
+		sendmsg = self._sock_sendmsg
+		while views:
+			sent = sendmsg(views)
+			while views and sent >= len(views[0]):
+				sent -= len(views[0])
+				views.pop(0)
+			if sent: # partial send of the first remaining part
+				views[0] = views[0][sent:]
+		return total
+
+	def _sendPartsZerocopy(self, parts: List) -> int:
+		"""
+		Like _sendParts but with MSG_ZEROCOPY (Linux, large payloads only):
+		the kernel pins the payload pages instead of copying them into the
+		socket buffers. As the API requires, references to the buffers are
+		kept until the kernel posts their completion notification on the
+		socket error queue; completions are reaped opportunistically after
+		each send and synchronously when the pinning limit is hit.
+		"""
+		views = [memoryview(p) for p in parts]
+		total = sum(len(v) for v in views)
+		sendmsg = self._sock_sendmsg
+		while views:
+			try:
+				sent = sendmsg(views,(),_MSG_ZEROCOPY)
+			except OSError as e:
+				if e.errno == socket.errno.ENOBUFS:
+					# too many pinned pages in flight; wait for completions
+					self._reapZerocopy(blocking = True)
+					continue
+				raise
+			self._zc_seq += 1
+			self._zc_pending.append((self._zc_seq,views[:]))
+			while views and sent >= len(views[0]):
+				sent -= len(views[0])
+				views.pop(0)
+			if sent:
+				views[0] = views[0][sent:]
+		self._reapZerocopy()
+		return total
+
+	def _reapZerocopy(self, blocking: bool = False):
+		"""
+		Drain zero-copy completion notifications from the socket error queue
+		and release the buffers they cover (TCP completes them in order).
+		The queue is shared with ICMP-origin errors, whose ee_data field is
+		not a sequence number, so a message only counts as a completion
+		after the level/type, errno and origin checks required by the kernel
+		zero-copy API; anything else is left for the regular paths to hit.
+		With BLOCKING, wait until at least one pending buffer is released;
+		MSG_ERRQUEUE reads never block whatever the socket mode, so the wait
+		is a poll with short sleeps (completions ride on the peer ACKs).
+		"""
+		flags = _MSG_ERRQUEUE | socket.MSG_DONTWAIT
+		reaped = False
+		while self._zc_pending:
+			try:
+				_,anc,_,_ = self._sock.recvmsg(0,512,flags)
+			except (BlockingIOError,InterruptedError):
+				if blocking and not reaped:
+					time.sleep(0.0005)
+					continue
+				return
+			for level,ctype,cdata in anc:
+				if (level != _SOL_IP or ctype != _IP_RECVERR
+						or len(cdata) < _EXT_ERR_STRUCT.size):
+					continue
+				ee = _EXT_ERR_STRUCT.unpack_from(cdata)
+				if ee[0] != 0 or ee[1] != _SO_EE_ORIGIN_ZEROCOPY:
+					continue # a real error report, not a completion
+				hi = ee[6] # last completed zero-copy sequence number
+				while self._zc_pending and self._zc_pending[0][0] <= hi:
+					self._zc_pending.popleft()
+					reaped = True
+
+	def _assertOwner(self):
+		"""
+		Enforce the single-thread ownership contract: the first thread that
+		sends or reads owns the point for the rest of the connection. The
+		hot paths run raw blocking socket calls with no locks, which is only
+		sound under this contract, so breaking it fails loudly here instead
+		of corrupting interleaved frames on the wire.
+		"""
+		tid = threading.get_ident()
+		if tid != self._owner_tid:
+			if self._owner_tid is not None:
+				raise RuntimeError("CommPoint owned by thread {} used from "
+								   "thread {}".format(self._owner_tid,tid))
+			self._owner_tid = tid
+
+	# how often (in receive operations) the receive buffer may shrink back
+	# toward its high-water mark, to bound resident memory after a burst of
+	# unusually large messages
+	_SHRINK_PERIOD = 4096
+
+	def _recvExact(self, n: int, deadline: float = None) -> memoryview:
+		"""
+		Return a view of exactly N received bytes (only valid until the next
+		receive). The receive buffer is user-space read buffering: each recv
+		fills as much of it as the kernel has pending, so when several frames
+		sit in the kernel buffer (length prefix plus payload, or back-to-back
+		messages) they are pulled out with one syscall and the following
+		_recvExact() calls are served without touching the socket at all.
+		The buffer grows 2x when needed and periodically shrinks back to 2x
+		the recent high-water mark.
+		DEADLINE, if given, is the time.monotonic() instant after which to
+		give up with CommError("timed out"). The socket itself stays in
+		blocking mode: the bound is a wait on the persistent selector before
+		each recv, with the remaining time, so even a stalled peer that sent
+		only part of a frame cannot block the caller past the deadline.
+		"""
+		start = self._rd_start
+		avail = self._rd_end - start
+		if avail >= n: # already buffered: no syscall
+			self._rd_start = start + n
+			return memoryview(self._recv_buf)[start:start + n]
+		buf = self._recv_buf
+		if avail and start: # compact the pending bytes to the front
+			buf[:avail] = buf[start:self._rd_end]
+		self._rd_start = 0
+		self._rd_end = avail
+		self._recv_count += 1
+		if self._recv_count >= BaseCommPoint._SHRINK_PERIOD:
+			self._recv_count = 0
+			cap = max(2 * self._recv_hw,self._rdcap_min)
+			if cap < len(buf) and avail <= cap:
+				newbuf = bytearray(cap)
+				newbuf[:avail] = buf[:avail]
+				self._recv_buf = buf = newbuf
+			self._recv_hw = 0
+		if n > self._recv_hw:
+			self._recv_hw = n
+		if n > len(buf):
+			newbuf = bytearray(max(n,2 * len(buf)))
+			newbuf[:avail] = buf[:avail]
+			self._recv_buf = buf = newbuf
+		mv = memoryview(buf)
+		recv_into = self._sock_recv_into
+		while self._rd_end - self._rd_start < n:
+			if deadline is not None:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0.0 or not self._sel.select(remaining):
+					raise(CommError("timed out")) # we assume the other side has shut down
+			got = recv_into(mv[self._rd_end:]) # fill whatever the kernel has
+			if got == 0:
+				raise(RuntimeError("Connection closed while receiving"))
+			if self._quickack: # cleared by the kernel after use; re-arm
+				self._sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_QUICKACK,1)
+			self._rd_end += got
+		self._rd_start = n
+		return mv[:n]
+
+	def sendData(self, data: Dict):
 		"""
 		Send that data properly to the other side.
-		Return non-empty string with any error in the connection.
+		Raise CommError if any error in the connection.
+		"""
+		if not self._begun:
+			raise RuntimeError("Cannot send data in not-begun commpoint")
+		self._assertOwner()
+		self._sendFrame(self._serialize(data))
+
+	def encode(self, data: Dict) -> bytes:
+		"""
+		Serialize DATA exactly as sendData() would and return it as a single
+		bytes object, to be sent later (possibly many times) with
+		sendEncoded(). Lets callers cache the encoding of constant messages
+		instead of re-serializing them on every send.
+		"""
+		return b"".join(map(bytes,self._serialize(data)))
+
+	def sendEncoded(self, payload: bytes):
+		"""
+		Send a PAYLOAD previously produced by encode(), skipping
+		serialization entirely; the other side reads it as a normal data
+		message.
+		Raise CommError if any error in the connection.
 		"""
 		if not self._begun:
 			raise RuntimeError("Cannot send data in not-begun commpoint")
-		mydictser = pickle.dumps(data)
+		self._assertOwner()
+		self._sendFrame([payload])
+
+	def sendRaw(self, raw):
+		"""
+		Send an already-encoded payload (a bytes-like object) without any
+		serialization; the other side gets it back verbatim from readData().
+		Meant for fixed-schema messages packed by the caller and for
+		pre-serialized constants, where the serializer would be pure
+		overhead.
+		Raise CommError if any error in the connection.
+		"""
+		if not self._begun:
+			raise RuntimeError("Cannot send data in not-begun commpoint")
+		self._assertOwner()
+		self._sendFrame([_MARK_RAW,raw])
+
+	def _sendFrame(self, parts: List):
+		"""
+		Frame the serialized PARTS (length prefix or shared-memory token)
+		and send them to the other side.
+		Raise CommError if any error in the connection.
+		"""
+		total = sum(len(p) for p in parts)
 		try:
-			if self._debug:
-				self._printInfo("Sending " + str(len(mydictser)) + " bytes...")
-			self._sock.send(mydictser)
-			if self._debug:
-				self._printInfo("\tSent ok.")
-			return ""
+			self._log("Sending %d bytes...",total)
+			if self._shm_tx is not None and total <= self._shmsize // 2:
+				# fast path: payload goes through shared memory and only the
+				# ready token (sentinel prefix + offset/length) hits the wire
+				off = (self._shmsize // 2) * self._shm_tx_idx
+				self._shm_tx_idx ^= 1
+				buf = self._shm_tx.buf
+				pos = off
+				for p in parts:
+					buf[pos:pos + len(p)] = p
+					pos += len(p)
+				_LEN_STRUCT.pack_into(self._len_buf,0,_SHM_SENTINEL)
+				self._sendParts([self._len_buf,
+								 _SHM_TOKEN_STRUCT.pack(off,total)])
+			elif self._zerocopy and total >= _ZEROCOPY_MIN:
+				# large payload: let the kernel pin the pages instead of
+				# copying them (the prefix is freshly packed here because
+				# zero-copy buffers must stay untouched until completion)
+				self._sendPartsZerocopy([_LEN_STRUCT.pack(total)] + parts)
+			else:
+				# 4-byte length prefix so the receiver knows exactly how much
+				# to read; sent in the same scatter-gather syscall as the
+				# payload, packed into a reusable buffer
+				_LEN_STRUCT.pack_into(self._len_buf,0,total)
+				self._sendParts([self._len_buf] + parts)
+			self._log("\tSent ok.")
+		except CommError:
+			raise
 		except Exception as e:
-			return str(e)
-		
-	def readData(self, timeout: float = 2.0) -> Tuple[str, Dict]:
+			raise(CommError(str(e))) from e
+
+	def readData(self, timeout: float = 2.0) -> Dict:
 		"""
-		Read the data (blocking if timeout > 0.0) from the other side.
-		Return non-empty string if any error in the connection (connection closed, timeout in receiving, user interrupt, etc.)
+		Read and return the data (blocking if timeout > 0.0) from the other
+		side. Frames land in a reusable per-connection buffer via recv_into
+		(see _recvExact()), so reading allocates no wire-sized objects in
+		steady state.
+		Raise CommError if any error in the connection (connection closed,
+		timeout in receiving, user interrupt, etc.).
 		"""
 		if not self._begun:
 			raise RuntimeError("Cannot send data in not-begun commpoint")
+		self._assertOwner()
+		# the timeout is a monotonic deadline carried through every receive
+		# of the frame (see _recvExact()); the socket itself stays in
+		# blocking mode, avoiding the two settimeout mode switches (fcntl
+		# syscalls) per message. Bytes already in the read buffer need no
+		# wait at all.
 		if timeout <= 0.0:
-			timeout = None
-		self._sock.settimeout(timeout) # after this, we assume the other side has shut down
+			deadline = None
+		else:
+			deadline = time.monotonic() + timeout
 		try:
-			if self._debug:
-				self._printInfo("Receiving...")
-			data = self._sock.recv(self._datachunkmaxsize)
-			if data == b'':
-				raise(RuntimeError("Connection closed while receiving"))
-			result = pickle.loads(data)
-			if self._debug:
-				self._printInfo("\tReceived " + str(len(data)) + " bytes.")
-			res = ""
+			self._log("Receiving...")
+			length = _LEN_STRUCT.unpack(
+						self._recvExact(_LEN_STRUCT.size,deadline))[0]
+			if length == _SHM_SENTINEL: # payload waits in shared memory
+				off,length = _SHM_TOKEN_STRUCT.unpack(
+								self._recvExact(_SHM_TOKEN_STRUCT.size,deadline))
+				result = self._deserialize(self._shm_rx.buf[off:off + length])
+			else:
+				result = self._deserialize(self._recvExact(length,deadline))
+			self._log("\tReceived %d bytes.",length)
+		except CommError:
+			raise
 		except Exception as e:
-			result = None
-			res = str(e)
-		self._sock.settimeout(None) # to deactivate timeout in other operations
-		return res, result
+			raise(CommError(str(e))) from e
+		return result
 		
 	def checkDataToRead(self):
 		"""
-		Check whether the socket has data to read and return True in that case.
-		This is a non-blocking test.
+		Check whether there are data to read and return True in that case.
+		Bytes already pulled into the read buffer count as data; otherwise this
+		is a non-blocking test on the persistent selector (the fd stays
+		registered in the kernel; no per-call fd-set rebuilding).
 		"""
 		if not self._begun:
 			raise RuntimeError("Cannot send data in not-begun commpoint")
-		if self._debug:
-			self._printInfo("Peeking...")
-		ready_to_read, _, _ = select.select([self._sock], # sockets to check for reading
-											[], [], # writes and exceptions to check 
-											0) # non-blocking
-		if ready_to_read:
+		self._log("Peeking...")
+		return self._rd_end > self._rd_start or bool(self._sel.select(0))
+
+	def waitDataToRead(self, timeout: float) -> bool:
+		"""
+		Wait up to TIMEOUT seconds for data to arrive and return True as soon
+		as there is some, or False if the wait expired. A single wait on the
+		persistent selector: unlike polling checkDataToRead() in a loop, the
+		caller burns no CPU while idle and wakes as soon as data shows up.
+		Returns True right away if the read buffer already holds data.
+		"""
+		if not self._begun:
+			raise RuntimeError("Cannot send data in not-begun commpoint")
+		if self._rd_end > self._rd_start:
 			return True
-		return False
+		return bool(self._sel.select(timeout))
 			
 
 
@@ -158,18 +777,37 @@ class BaseCommPoint:
 
 class ServerCommPoint(BaseCommPoint):
 	
-	def __init__(self, po: int):
+	def __init__(self, po: int, transport: str = "inet", shmsize: int = 0, sockbufsize: int = 65536):
 		"""
 		Constructor. Server listening at that port.
+		TRANSPORT may be "unix" to listen on an AF_UNIX socket instead of TCP
+		(only for clients on the same machine; see BaseCommPoint).
+		SHMSIZE > 0 enables the shared-memory payload fast path (same-machine
+		clients only; see BaseCommPoint).
+		SOCKBUFSIZE is the kernel socket buffer size; raise it when messages
+		carry large payloads over a real network (see BaseCommPoint).
 		"""
 		self._servip = BaseCommPoint.get_ip()
-		super().__init__(kind = BaseCommPoint.Kind.SERVER, port = po, ipv4 = self._servip)
+		super().__init__(kind = BaseCommPoint.Kind.SERVER, port = po, ipv4 = self._servip, transport = transport, shmsize = shmsize, sockbufsize = sockbufsize)
 		finish = False
 		tries = 0
 		while not finish:
 			try:
-				self._basesock = socket.socket(socket.AF_INET,socket.SOCK_STREAM) # 1st arg: ip4, 2nd: TCP
-				self._basesock.bind((self._ipv4,self._port)) # does not block
+				if self._transport == "unix":
+					self._basesock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+					sockname = _unixSocketName(self._port)
+					if not sockname.startswith("\0") and os.path.exists(sockname):
+						os.unlink(sockname) # stale socket file from a previous run
+					self._basesock.bind(sockname) # does not block
+				else:
+					self._basesock = socket.socket(socket.AF_INET,socket.SOCK_STREAM) # 1st arg: ip4, 2nd: TCP
+					# allow re-binding immediately after a restart, when the
+					# previous run's socket may linger in TIME_WAIT
+					self._basesock.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+					if hasattr(socket,"SO_REUSEPORT"): # Linux/BSD; also lets
+						# parallel runs shard ports without bind conflicts
+						self._basesock.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEPORT,1)
+					self._basesock.bind((self._ipv4,self._port)) # does not block
 				finish = True
 			except socket.error as e:
 				if e.errno == socket.errno.EADDRINUSE:
@@ -177,8 +815,10 @@ class ServerCommPoint(BaseCommPoint):
 					if tries > 10:
 						print("Too many tries. Aborting")
 						raise
-					print(f"Port {self._servip}:{po} already in use. Retrying in 13 secs ({tries})...")
-					time.sleep(13) # wait to retry
+					# with SO_REUSEADDR this only happens when another live
+					# process owns the port, so a short back-off is enough
+					print(f"Port {self._servip}:{po} already in use. Retrying in 0.1 secs ({tries})...")
+					time.sleep(0.1) # wait to retry
 				else:
 					print(f"Socket error: {e}")
 					raise
@@ -188,10 +828,12 @@ class ServerCommPoint(BaseCommPoint):
 	def __str__(self) -> str:
 		return "Server listening at {}:{}, began: {}".format(self._servip,self._port,self._begun)
 		
-	def begin(self,timeoutaccept: float) -> str:
+	def begin(self,timeoutaccept: float):
 		"""
 		Start the work for the server.
 		TIMEOUTACCEPT in seconds.
+		Raise CommError if no client connects in time or the connection
+		cannot be set up.
 		"""
 		if timeoutaccept <= 0.0:
 			raise ValueError("Timeoutaccept must be > 0.0")
@@ -200,30 +842,37 @@ class ServerCommPoint(BaseCommPoint):
 		self._basesock.settimeout(timeoutaccept) # after this, we assume the other side has shut down
 		try:
 			self._sock, _ = self._basesock.accept() # wait for calling us
+			self._configDataSocket()
 			self._begun = True
+			self._setupSharedMemory()
 			self._basesock.settimeout(None) # to deactivate timeout in other operations
-			return ""
 		except socket.timeout:
 			self._basesock.settimeout(None) # to deactivate timeout in other operations
-			return "timeout"
+			raise(CommError("timeout")) from None
+		except CommError:
+			raise
 		except Exception as e:
-			return str(e)
-			
-	def end(self) -> str: 
+			raise(CommError(str(e))) from e
+
+	def end(self):
 		"""
 		Ends the communications for the current work.
+		Raise CommError if the teardown fails.
 		"""
 		if self._begun:
 			try:
-				self._sock.close()			
+				self._teardownSharedMemory()
+				if self._sel is not None:
+					self._sel.unregister(self._sock)
+					self._sel.close()
+					self._sel = None
+				self._sock.close()
 				self._begun = False
-				return ""
 			except Exception as e:
-				return str(e)
-		return ""
-				
-		
-		
+				raise(CommError(str(e))) from e
+
+
+
 # -----------------------------------------------------------------------------
 #
 #	Class: ClientCommPoint
@@ -232,42 +881,61 @@ class ServerCommPoint(BaseCommPoint):
 
 class ClientCommPoint(BaseCommPoint):
 	
-	def __init__(self, ip: str, po: int):
+	def __init__(self, ip: str, po: int, transport: str = "inet", shmsize: int = 0, sockbufsize: int = 65536):
 		"""
 		Constructor. Client to connect to that ip:port.
+		TRANSPORT may be "unix" to connect through an AF_UNIX socket instead
+		of TCP (only when the server is on the same machine; see
+		BaseCommPoint).
+		SHMSIZE > 0 enables the shared-memory payload fast path (same-machine
+		server only; see BaseCommPoint).
+		SOCKBUFSIZE is the kernel socket buffer size; raise it when messages
+		carry large payloads over a real network (see BaseCommPoint).
 		"""
 		self._myip = BaseCommPoint.get_ip()
-		super().__init__(kind = BaseCommPoint.Kind.CLIENT, ipv4 = ip, port = po)
+		super().__init__(kind = BaseCommPoint.Kind.CLIENT, ipv4 = ip, port = po, transport = transport, shmsize = shmsize, sockbufsize = sockbufsize)
 
 	def __str__(self) -> str:
 		return "Client at {} to connect to {}:{}, began: {}".format(self._myip,self._ipv4,self._port,self._begun)
 		
-	def begin(self) -> str:
+	def begin(self):
 		"""
 		Start the work for the client.
+		Raise CommError if the connection cannot be established.
 		"""
 		if not self._begun:
 			self.end()
 		try:
-			self._sock = socket.socket(socket.AF_INET,socket.SOCK_STREAM) # 1st arg: ip4, 2nd: TCP
-			self._sock.connect((self._ipv4,self._port)) # if bind-listen has been done on the other side but accept has not, ends immediately even when the server is not accpeting at the time (connection is kept pending), and data can be sent; if bind-listen has not been done on the other side, an error is raised
+			if self._transport == "unix":
+				self._sock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+				self._sock.connect(_unixSocketName(self._port))
+			else:
+				self._sock = socket.socket(socket.AF_INET,socket.SOCK_STREAM) # 1st arg: ip4, 2nd: TCP
+				self._sock.connect((self._ipv4,self._port)) # if bind-listen has been done on the other side but accept has not, ends immediately even when the server is not accpeting at the time (connection is kept pending), and data can be sent; if bind-listen has not been done on the other side, an error is raised
+			self._configDataSocket()
 			self._begun = True
-			return ""
+			self._setupSharedMemory()
+		except CommError:
+			raise
 		except Exception as e:
-			return str(e)
-		
-	def end(self) -> str: 
+			raise(CommError(str(e))) from e
+
+	def end(self):
 		"""
 		Ends the communications for the current work.
+		Raise CommError if the teardown fails.
 		"""
 		if self._begun:
 			try:
-				self._sock.close()			
+				self._teardownSharedMemory()
+				if self._sel is not None:
+					self._sel.unregister(self._sock)
+					self._sel.close()
+					self._sel = None
+				self._sock.close()
 				self._begun = False
-				return ""
 			except Exception as e:
-				return str(e)
-		return ""
+				raise(CommError(str(e))) from e
 
 	
 	
@@ -277,17 +945,13 @@ if __name__=='__main__':
 	if len(user_input) == 0:
 		comm = ServerCommPoint(49054)
 		print("[{}] prepared to begin".format(str(comm)))
-		if not comm.begin(60.0):
-			raise RuntimeError("No one has connected to this server before timeout")
+		comm.begin(60.0) # raises CommError if no one connects in time
 		print("[{}] connected".format(str(comm)))
 		ind = 0
 		while True:
 			data = comm.readData(30.0)
-			if data[0]:
-				print("\t#{}. Received data {}".format(ind,data[1]))
-			else:
-				raise RuntimeError("\t#{}. Some error receiving data".format(ind))
-			comm.sendData(data[1])
+			print("\t#{}. Received data {}".format(ind,data))
+			comm.sendData(data)
 			print("\t\tSent response")
 			ind += 1
 	else:
@@ -301,10 +965,7 @@ if __name__=='__main__':
 			comm.sendData({"d":54.54,"i":ind})
 			print("\t\tSent data")
 			data = comm.readData(30.0)
-			if data[0]:
-				print("\t#{}. Received response {}".format(ind,data[1]))
-			else:
-				raise RuntimeError("\t#{}. Some error receiving response".format(ind))
+			print("\t#{}. Received response {}".format(ind,data))
 			time.sleep(10)
 			ind += 1
 		
@@ -0,0 +1,140 @@
+"""
+
+CONTROL-SIGNAL RING ON SHARED MEMORY PLUS EVENTFD
+
+(c) Uncore Team, 2025
+
+An opt-in, Linux-only channel for the one-byte control signals of the step
+protocol (step/reset/finish indicators) between two processes on the same
+machine. The signals live in a small shared memory ring and the wake-up is
+an eventfd, so sending a signal costs one memory store plus one eventfd
+write and the receiver sleeps in the kernel until woken - the TCP stack is
+not involved at all. The socket transport remains in charge of the larger
+observation/action payloads.
+
+Each channel is one-directional with a single writer and a single reader.
+Signals queue up in order: several write() calls before a read are all
+delivered, one per read, which matters for pipelined command sequences
+(e.g. a reset immediately followed by a step). The eventfd count tracks the
+queue depth; the eventfd_write/eventfd_read syscalls also order the slot
+stores against the reads, so no explicit memory fences are needed.
+
+The eventfd is a file descriptor, not a named resource: the reading process
+must either inherit it (fork) or receive it through SCM_RIGHTS; the shared
+memory region is attached by name.
+
+"""
+
+import os
+import selectors
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+
+
+# region layout: write counter (writer-owned) at offset 0, read counter
+# (reader-owned) at offset 8, then the signal slots; the counters run free
+# and index the slots modulo _SLOTS
+_WR_OFF = 0
+_RD_OFF = 8
+_SLOT_OFF = 16
+_SLOTS = 256 # maximum outstanding (written, unread) signals
+_CNT_STRUCT = struct.Struct("<Q")
+
+
+class ControlChannel:
+	"""
+	One-directional single-writer/single-reader control-signal channel.
+	"""
+
+	def __init__(self, name: Optional[str] = None, fd: Optional[int] = None):
+		"""
+		Constructor. With no arguments, create a new channel (its shared
+		memory name is in .name and its eventfd in fileno(), both to be
+		handed to the peer process). With NAME and FD, attach to an existing
+		channel whose eventfd FD this process already holds.
+		"""
+		if not hasattr(os,"eventfd"):
+			raise RuntimeError("ControlChannel needs os.eventfd (Linux, Python >= 3.10)")
+		self._created = name is None
+		if self._created:
+			if fd is not None:
+				raise(ValueError("A file descriptor cannot be given when creating"))
+			self._shm = shared_memory.SharedMemory(create = True,
+												   size = _SLOT_OFF + _SLOTS)
+			self._shm.buf[:_SLOT_OFF] = bytes(_SLOT_OFF) # zeroed counters
+			# semaphore semantics: each read consumes exactly one write
+			self._fd = os.eventfd(0,os.EFD_SEMAPHORE)
+		else:
+			if fd is None:
+				raise(ValueError("The channel eventfd is needed to attach"))
+			self._shm = shared_memory.SharedMemory(name = name)
+			self._fd = fd
+		# local copies of the counter each role owns (the channel may already
+		# hold pending signals when attaching)
+		self._wr = _CNT_STRUCT.unpack_from(self._shm.buf,_WR_OFF)[0]
+		self._rd = _CNT_STRUCT.unpack_from(self._shm.buf,_RD_OFF)[0]
+		self._sel = selectors.DefaultSelector()
+		self._sel.register(self._fd,selectors.EVENT_READ)
+
+	@property
+	def name(self) -> str:
+		"""
+		Name of the underlying shared memory region.
+		"""
+		return self._shm.name
+
+	def fileno(self) -> int:
+		"""
+		The eventfd of the channel, to be passed to the reader process.
+		"""
+		return self._fd
+
+	def write(self, kind: int):
+		"""
+		Writer side: queue the control signal KIND (0..255) and wake the
+		reader. Signals are delivered in order, one per read; if the reader
+		has fallen _SLOTS signals behind, raise RuntimeError instead of
+		silently overwriting the oldest one.
+		"""
+		if self._wr - _CNT_STRUCT.unpack_from(self._shm.buf,_RD_OFF)[0] >= _SLOTS:
+			raise RuntimeError("Control channel full: {} signals unread".format(_SLOTS))
+		self._shm.buf[_SLOT_OFF + (self._wr % _SLOTS)] = kind
+		self._wr += 1
+		_CNT_STRUCT.pack_into(self._shm.buf,_WR_OFF,self._wr)
+		os.eventfd_write(self._fd,1)
+
+	def readBlocking(self, timeout: Optional[float] = None) -> Optional[int]:
+		"""
+		Reader side: sleep until a signal arrives and return the oldest
+		pending one, or return None if TIMEOUT seconds (None meaning
+		forever) elapse first.
+		"""
+		if not self._sel.select(timeout):
+			return None
+		os.eventfd_read(self._fd) # consume one wake-up
+		val = self._shm.buf[_SLOT_OFF + (self._rd % _SLOTS)]
+		self._rd += 1
+		_CNT_STRUCT.pack_into(self._shm.buf,_RD_OFF,self._rd)
+		return val
+
+	def tryRead(self) -> Optional[int]:
+		"""
+		Reader side: return the oldest pending signal, or None right away if
+		there is none.
+		"""
+		return self.readBlocking(0)
+
+	def close(self):
+		"""
+		Release the channel; the creator also removes the shared memory.
+		"""
+		self._sel.unregister(self._fd)
+		self._sel.close()
+		os.close(self._fd)
+		self._shm.close()
+		if self._created:
+			try:
+				self._shm.unlink()
+			except FileNotFoundError:
+				pass # already gone
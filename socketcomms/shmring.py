@@ -0,0 +1,183 @@
+"""
+
+LOCK-FREE SINGLE-PRODUCER/SINGLE-CONSUMER RING BUFFER ON SHARED MEMORY
+
+(c) Uncore Team, 2025
+
+An opt-in transport for colocated RL/agent processes: each direction of the
+step protocol is strict single-producer/single-consumer, so a pair of these
+rings can replace the socket entirely on the hot path, with no syscalls per
+message. One process creates the ring (create = True) and the other attaches
+to it by name; each side must act only as producer or only as consumer of a
+given ring.
+
+The producer owns the tail index and the consumer owns the head index, each
+living on its own cache line at the start of the region. Pure-Python stores
+into shared memory carry no memory fences, so the publish-after-copy store
+of an index is only ordered with respect to the data copy on strongly
+ordered (TSO) hardware, i.e. x86; on weakly ordered architectures such as
+ARM64 the peer could see a published index before the message bytes. The
+constructor therefore refuses to run on anything but x86 - use the socket
+path or a ControlChannel there instead.
+
+"""
+
+import platform
+import time
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+
+
+# region layout: head index (consumer-owned) at offset 0, the ring capacity
+# (written once at creation, read at attach) at offset 8, tail index
+# (producer-owned) at offset 64 so it sits on another cache line, and the
+# power-of-2 data area starting at offset 128
+_HEAD_OFF = 0
+_CAP_OFF = 8
+_TAIL_OFF = 64
+_DATA_OFF = 128
+_IDX_STRUCT = struct.Struct("<Q") # free-running 64-bit indices, never wrap
+_MSGLEN_STRUCT = struct.Struct("<I") # per-message length prefix
+
+
+class SPSCRing:
+	"""
+	One-directional lock-free ring buffer over a shared memory region.
+	"""
+
+	def __init__(self, capacity: int = 1 << 20, name: Optional[str] = None, create: bool = True):
+		"""
+		Constructor. With CREATE, a new shared memory region is allocated
+		(its generated name is in .name, to be given to the peer); CAPACITY
+		is its data area size in bytes and must be a power of two. When
+		attaching instead, NAME must be the name of an existing ring and
+		CAPACITY is ignored: the real one is read from the ring header, so
+		the two sides cannot disagree on it.
+		"""
+		if platform.machine().lower() not in ("x86_64","amd64","i686","i386"):
+			# the index publication relies on x86 total store ordering (see
+			# the module docstring); nothing fences it on weaker hardware
+			raise RuntimeError("SPSCRing is only safe on x86 machines, not "
+							   "{}".format(platform.machine()))
+		if create:
+			if capacity <= 0 or (capacity & (capacity - 1)) != 0:
+				raise(ValueError("Ring capacity {} is invalid; it should be a power of two".format(capacity)))
+			self._cap = capacity
+			self._shm = shared_memory.SharedMemory(create = True,
+												   size = _DATA_OFF + capacity)
+			self._shm.buf[:_DATA_OFF] = bytes(_DATA_OFF) # zeroed indices
+			_IDX_STRUCT.pack_into(self._shm.buf,_CAP_OFF,capacity)
+		else:
+			if name is None:
+				raise(ValueError("A ring name is needed to attach"))
+			self._shm = shared_memory.SharedMemory(name = name)
+			self._cap = _IDX_STRUCT.unpack_from(self._shm.buf,_CAP_OFF)[0]
+			if (self._cap <= 0 or (self._cap & (self._cap - 1)) != 0
+					or self._shm.size < _DATA_OFF + self._cap):
+				raise(ValueError("Region {} does not hold a valid ring".format(name)))
+		self._created = create
+		# local copies of the index each role owns (the authoritative value
+		# in shared memory is only written by that role)
+		self._head_local = self._loadIdx(_HEAD_OFF)
+		self._tail_local = self._loadIdx(_TAIL_OFF)
+
+	@property
+	def name(self) -> str:
+		"""
+		Name of the underlying shared memory region.
+		"""
+		return self._shm.name
+
+	def _loadIdx(self, off: int) -> int:
+		return _IDX_STRUCT.unpack_from(self._shm.buf,off)[0]
+
+	def _storeIdx(self, off: int, val: int):
+		_IDX_STRUCT.pack_into(self._shm.buf,off,val)
+
+	def _copyIn(self, pos: int, data):
+		"""
+		Copy DATA into the ring data area starting at logical position POS,
+		wrapping around the end at most once.
+		"""
+		start = pos & (self._cap - 1)
+		n = len(data)
+		first = min(n,self._cap - start)
+		view = memoryview(data)
+		self._shm.buf[_DATA_OFF + start:_DATA_OFF + start + first] = view[:first]
+		if first < n:
+			self._shm.buf[_DATA_OFF:_DATA_OFF + n - first] = view[first:]
+
+	def _copyOut(self, pos: int, n: int) -> bytes:
+		"""
+		Copy N bytes out of the ring data area starting at logical position
+		POS, wrapping around the end at most once.
+		"""
+		start = pos & (self._cap - 1)
+		first = min(n,self._cap - start)
+		out = bytearray(n)
+		out[:first] = self._shm.buf[_DATA_OFF + start:_DATA_OFF + start + first]
+		if first < n:
+			out[first:] = self._shm.buf[_DATA_OFF:_DATA_OFF + n - first]
+		return bytes(out)
+
+	def push(self, data) -> bool:
+		"""
+		Producer side: append one message (a bytes-like object) to the ring.
+		Return False without blocking if there is not enough free space.
+		"""
+		need = _MSGLEN_STRUCT.size + len(data)
+		if need > self._cap:
+			raise(ValueError("Message of {} bytes cannot ever fit this ring".format(len(data))))
+		head = self._loadIdx(_HEAD_OFF) # the consumer advances this
+		if self._cap - (self._tail_local - head) < need:
+			return False
+		self._copyIn(self._tail_local,_MSGLEN_STRUCT.pack(len(data)))
+		self._copyIn(self._tail_local + _MSGLEN_STRUCT.size,data)
+		self._tail_local += need
+		self._storeIdx(_TAIL_OFF,self._tail_local) # publish after the copy
+		return True
+
+	def pop(self) -> Optional[bytes]:
+		"""
+		Consumer side: take the oldest message out of the ring, or return
+		None without blocking if the ring is empty.
+		"""
+		tail = self._loadIdx(_TAIL_OFF) # the producer advances this
+		if tail == self._head_local:
+			return None
+		n = _MSGLEN_STRUCT.unpack(
+				self._copyOut(self._head_local,_MSGLEN_STRUCT.size))[0]
+		data = self._copyOut(self._head_local + _MSGLEN_STRUCT.size,n)
+		self._head_local += _MSGLEN_STRUCT.size + n
+		self._storeIdx(_HEAD_OFF,self._head_local) # free space after the copy
+		return data
+
+	def popBlocking(self, timeout: Optional[float] = None) -> Optional[bytes]:
+		"""
+		Consumer side: like pop(), but wait for a message. Spin briefly and
+		then back off with short sleeps; return None only on TIMEOUT (in
+		seconds, None meaning wait forever).
+		"""
+		deadline = None if timeout is None else time.monotonic() + timeout
+		spins = 0
+		while True:
+			data = self.pop()
+			if data is not None:
+				return data
+			spins += 1
+			if spins > 100: # stop burning CPU once the wait gets long
+				time.sleep(0.0001)
+			if deadline is not None and time.monotonic() >= deadline:
+				return None
+
+	def close(self):
+		"""
+		Detach from the ring; the creator also removes the region.
+		"""
+		self._shm.close()
+		if self._created:
+			try:
+				self._shm.unlink()
+			except FileNotFoundError:
+				pass # already gone
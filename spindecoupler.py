@@ -8,7 +8,28 @@ Uncore Team, 2025
 """
 
 from enum import Enum
-from socketcomms.comms import ClientCommPoint,ServerCommPoint
+import struct
+from socketcomms.comms import ClientCommPoint,CommError,ServerCommPoint
+
+
+# first byte of a fixed-schema (raw) wire message identifies its meaning;
+# these messages bypass the serializer entirely (see setSchema())
+_RAW_STEP = 1		# RL -> agent: packed action follows
+_RAW_STEPOBS = 3	# agent -> RL: last action duration, reward, agent time
+					# and observation follow
+_RAW_RESETOBS = 4	# agent -> RL: agent time and observation follow
+
+
+def _schemaStructs(actsize: int, obssize: int):
+	"""
+	Precompiled structs of the fixed-schema wire messages: action, step
+	observation and reset observation (see the setSchema() methods).
+	"""
+	if actsize <= 0 or obssize <= 0:
+		raise(ValueError("Schema sizes must be > 0"))
+	return (struct.Struct("!B{}f".format(actsize)),
+			struct.Struct("!Bddd{}f".format(obssize)),
+			struct.Struct("!Bd{}f".format(obssize)))
 
 
 #-------------------------------------------------------------------------------
@@ -21,57 +42,127 @@ class RLSide:
 	"""
 	Your RL class must create an instance of this in order to communicate
 	with the agent that actually produces observations and executes actions.
+	The connection with the agent is a single persistent session: it is
+	established once here and kept open across every step/reset until the
+	experiment finishes, so no per-step connection setup cost is paid.
 	"""
 	
-	def __init__(self, port: int, verbose: bool = False):
+	def __init__(self, port: int, verbose: bool = False, transport: str = "inet", sockbufsize: int = 65536, shmsize: int = 0):
 		"""
 		In PORT, the number of the port to use for comms., e.g., 49054.
+		TRANSPORT may be "unix" when the agent runs on this same machine,
+		which avoids the loopback TCP/IP stack (the agent side must use the
+		same transport).
+		SOCKBUFSIZE is the kernel socket buffer size; the default is fine for
+		small observations, but when they carry images or large state vectors
+		over a real network it should be raised to at least the
+		bandwidth-delay product of the link (see BaseCommPoint).
+		SHMSIZE > 0 moves message payloads through a shared memory region of
+		that many bytes per direction instead of the socket, the cheapest
+		transport when the agent runs on this same machine; the agent side
+		must use the same SHMSIZE (see BaseCommPoint).
 		"""
-		
+
 		self._verbose = verbose
-		self._rlcomm = ServerCommPoint(port) # socket not connected yet
+		self._act_struct = None # set in setSchema()
+		self._stepobs_struct = None
+		self._resetobs_struct = None
+		self._rlcomm = ServerCommPoint(port,transport = transport,
+									   sockbufsize = sockbufsize,
+									   shmsize = shmsize) # socket not connected yet
 											 # if socket in use, repeatedly wait
 											 # until free
+		# constant control messages, encoded once here instead of per call
+		self._RESET_MSG = self._rlcomm.encode(dict({"stepkind": "reset"}))
+		self._FINISH_MSG = self._rlcomm.encode(dict({"stepkind": "finish"}))
 		if self._verbose:
 			print("RL decoupler enabled. Waiting for agent connection...")
-		res = self._rlcomm.begin(timeoutaccept = 60.0) # blocks for agent
-		if len(res) > 0:
-			raise RuntimeError("No agent connection: " + res)
+		self._rlcomm.begin(timeoutaccept = 60.0) # blocks for agent; raises
+												 # CommError if none connects
 		if self._verbose:
 			print("Agent connected to this RL")
-			
-			
+
+
 	def __del__(self):
-	
-		res = self._rlcomm.end()
-		if len(res) > 0:
-			print("Error closing communications with the agent: " + res)
+
+		try:
+			self._rlcomm.end()
+		except CommError as e:
+			print("Error closing communications with the agent: " + str(e))
 		if self._verbose:
 			print("Communications closed in the RL side.")
 
 		
+	def setSchema(self, actsize: int, obssize: int):
+		"""
+		Enable the fixed-schema fast path: actions are flat sequences of
+		ACTSIZE floats and observations flat sequences of OBSSIZE floats.
+		The agent side must call its setSchema() with the same sizes. After
+		this, actions and observations travel as packed float32 vectors
+		instead of serialized dictionaries (orders of magnitude cheaper to
+		encode per step), and observations are returned as flat tuples of
+		floats instead of dictionaries. Payloads that do not match the
+		schema still fall back to the dictionary path.
+		"""
+		self._act_struct,self._stepobs_struct, \
+			self._resetobs_struct = _schemaStructs(actsize,obssize)
+
+
+	def resetRequest(self):
+		"""
+		Send the reset indicator to the agent without waiting for the
+		observation; pair with resetReadObs(). Splitting the round trip lets
+		the caller pipeline further sends (e.g., a speculative first action
+		through stepSendAct()) while the reset observation is still in
+		flight, hiding one RTT per episode boundary: the agent processes
+		commands in order, so the responses come back in the same order.
+		It raises CommError if any error in communications.
+		"""
+
+		self._rlcomm.sendEncoded(self._RESET_MSG)
+
+
+	def resetReadObs(self, timeout: float = 10.0):
+		"""
+		Read the after-reset observation requested by resetRequest(),
+		blocking until the agent sends it.
+		TIMEOUT is the timeout in seconds used for communication operations that
+		admit a timeout. If it is <0.0, no timeout is checked.
+		It raises CommError if any error in communications.
+		Return both the observation (a dictionary, or a flat tuple of floats
+		if setSchema() was used) and the agent time when that observation was
+		gathered (a float).
+		"""
+
+		obsato = self._rlcomm.readData(timeout)
+
+		if isinstance(obsato,(bytes,bytearray)): # fixed-schema fast path
+			if self._resetobs_struct is None:
+				raise RuntimeError("Received a fixed-schema message but no "
+								   "schema is set; call setSchema() first")
+			vals = self._resetobs_struct.unpack(obsato)
+			if vals[0] != _RAW_RESETOBS:
+				raise(ValueError("Unexpected raw message {} after reset".format(vals[0])))
+			return vals[2:], vals[1] # return tuple
+
+		return obsato["obs"], obsato["ato"] # return tuple
+
+
 	def resetGetObs(self, timeout: float = 10.0):
 		"""
-		Call this method at the start of your RL reset() to request from the 
+		Call this method at the start of your RL reset() to request from the
 		agent the first observation after a reset, as a dictionary. The caller
 		gets blocked until the agent sends the observation.
 		TIMEOUT is the timeout in seconds used for communication operations that
 		admit a timeout. If it is <0.0, no timeout is checked.
-		It raises RuntimeError() if any error in communications.
-		Return both the observation (a dictionary) and the agent time when that
-		observation was gathered (a float).
+		It raises CommError if any error in communications.
+		Return both the observation (a dictionary, or a flat tuple of floats
+		if setSchema() was used) and the agent time when that observation was
+		gathered (a float).
 		"""
-		
-		res = self._rlcomm.sendData(dict({"stepkind": "reset"}))
-		if len(res) > 0:
-			raise RuntimeError("Error sending what to do to the agent. " + res)	
-			
-		res,obsato = self._rlcomm.readData(timeout)
-		if len(res) > 0:
-			raise RuntimeError("Error reading after-reset observation from "
-							   "the agent. " + res)
-					
-		return obsato["obs"], obsato["ato"] # return tuple
+
+		self.resetRequest()
+		return self.resetReadObs(timeout)
 
 	
 	def stepSendActGetObs(self, action,timeout:float = 10.0):
@@ -80,41 +171,84 @@ class RLSide:
 		to the agent and then get the resulting observation, both as 
 		dictionaries. The caller gets blocked until the agent executes the 
 		action and sends back the observation. Along with the observation, it
-		returns the total duration of the action previous to this one, the 
+		returns the total duration of the action previous to this one, the
 		reward calculated by the agent for the current action and the agent
 		time when it got the observation.
+		If setSchema() was used and the action matches the schema, action and
+		observation travel as packed float vectors and the observation is
+		returned as a flat tuple of floats.
 		TIMEOUT is the timeout in seconds used for communication operations that
 		admit a timeout. If it is <0.0, no timeout is checked.
-		It raises RuntimeError() if any error in communications.
-		""" 
-		
+		It raises CommError if any error in communications.
+		"""
+
+		self.stepSendAct(action)
+		return self.stepReadObs(timeout)
+
+
+	def stepSendAct(self, action):
+		"""
+		Send ACTION to the agent without waiting for the resulting
+		observation; pair with stepReadObs(). Splitting the round trip lets
+		the caller overlap its own computation (or further pipelined sends,
+		see resetRequest()) with the action execution on the agent.
+		It raises CommError if any error in communications.
+		"""
+
 		# send a STEP indicator to the agent interface, that should use
-		# readWhatToDo() to get the indicator
-		res = self._rlcomm.sendData(dict({"stepkind": "step",
-										  "action": action}))
-		if len(res) > 0:
-			raise RuntimeError("Error sending step action: " + res)
-
-		res,lat = self._rlcomm.readData(timeout) # blocks
-		if len(res) > 0:
-			raise RuntimeError("Error receiving last action duration: " + res)
-			
-		res,obsrewato = self._rlcomm.readData(timeout) # blocks
-		if len(res) > 0:
-			raise RuntimeError("Error receiving step observation: " + res)
-
-		return lat["lat"], obsrewato["obs"], obsrewato["rew"], obsrewato["ato"]
+		# readWhatToDo() to get the indicator; the action travels in the same
+		# message, so indicator + action cost a single send syscall
+		raw = None
+		if self._act_struct is not None:
+			try:
+				raw = self._act_struct.pack(_RAW_STEP,*action)
+			except (TypeError,struct.error):
+				raw = None # action does not match the schema; send as dict
+		if raw is not None:
+			self._rlcomm.sendRaw(raw)
+		else:
+			self._rlcomm.sendData(dict({"stepkind": "step",
+										"action": action}))
+
+
+	def stepReadObs(self, timeout:float = 10.0):
+		"""
+		Read the response of an action sent with stepSendAct(), blocking
+		until the agent sends it. Return the same tuple as
+		stepSendActGetObs().
+		TIMEOUT is the timeout in seconds used for communication operations that
+		admit a timeout. If it is <0.0, no timeout is checked.
+		It raises CommError if any error in communications.
+		"""
+
+		# the last action duration travels together with the observation in a
+		# single message (see AgentSide.stepSendObs()), so a step costs one
+		# read here instead of two
+		obsrewato = self._rlcomm.readData(timeout) # blocks
+		if isinstance(obsrewato,(bytes,bytearray)): # fixed-schema fast path
+			if self._stepobs_struct is None:
+				raise RuntimeError("Received a fixed-schema message but no "
+								   "schema is set; call setSchema() first")
+			vals = self._stepobs_struct.unpack(obsrewato)
+			if vals[0] != _RAW_STEPOBS:
+				raise(ValueError("Unexpected raw message {} after step".format(vals[0])))
+			return vals[1], vals[4:], vals[2], vals[3]
+
+		return obsrewato["lat"], obsrewato["obs"], obsrewato["rew"], \
+			obsrewato["ato"]
 
 				
 	def stepExpFinished(self, timeout:float = 10.0):
 		""" 
 		Call this method at the end of your RL step() ONLY IF the learning
 		has finished completely after that step.
+		The finish indicator, like the reset one, is a constant message
+		serialized once in the constructor and sent as cached bytes here.
 		TIMEOUT is the timeout in seconds used for communication operations that
 		admit a timeout. If it is <0.0, no timeout is checked.
 		"""
 		
-		self._rlcomm.sendData(dict({"stepkind": "finish"}))
+		self._rlcomm.sendEncoded(self._FINISH_MSG)
 		 	
 		 	
 #-------------------------------------------------------------------------------
@@ -128,6 +262,9 @@ class AgentSide:
 	Your agent interface (e.g., with a robot or a simulation), in charge of
 	getting observations and executing actions, must contain an instance of
 	this class to communicate with the RL spin loop, which provides the actions.
+	As in RLSide, the connection is established once in the constructor and
+	kept open for the whole experiment; no step or reset pays any connection
+	setup or teardown cost.
 	"""
 	
 	class WhatToDo(Enum):
@@ -135,52 +272,92 @@ class AgentSide:
 		Things that RL is intending for the agent interface to do.
 		"""
 		
-		REC_ACTION_SEND_OBS = 0	# receive action from RL, executes it and sends 
+		REC_ACTION_SEND_OBS = 0	# receive action from RL, executes it and sends
 								# back resulting observation and other stuff
 		RESET_SEND_OBS = 1		# reset episode and send observation back to RL
 		FINISH = 2				# finish experiment (and comms)
+
+	# stepkind indicator -> WhatToDo, one hash lookup per spin iteration
+	# instead of a cascade of string compares (see readWhatToDo())
+	_KIND = {"step": WhatToDo.REC_ACTION_SEND_OBS,
+			 "reset": WhatToDo.RESET_SEND_OBS,
+			 "finish": WhatToDo.FINISH}
+
 	
-	
-	def __init__(self, ipbaselinespart:str, 
-				 portbaselinespart:int, 
-				 verbose:bool = False):
+	def __init__(self, ipbaselinespart:str,
+				 portbaselinespart:int,
+				 verbose:bool = False,
+				 transport:str = "inet",
+				 sockbufsize:int = 65536,
+				 shmsize:int = 0):
 		"""
 		IPBASELINESPART is the IPv4 of the baselines part of the system, e.g.,
 		"BaseCommPoint.get_ip()".
 		PORTBASELINESPART is the port, e.g., 49054.
+		TRANSPORT may be "unix" when the RL side runs on this same machine,
+		which avoids the loopback TCP/IP stack (the RL side must use the same
+		transport).
+		SOCKBUFSIZE is the kernel socket buffer size; raise it when
+		observations carry large payloads over a real network (see RLSide).
+		SHMSIZE > 0 moves message payloads through shared memory (RL side on
+		this same machine only; it must use the same SHMSIZE; see RLSide).
 		"""
-		
+
 		self._verbose = verbose
-		self._rlcomm = ClientCommPoint(ipbaselinespart,portbaselinespart)
+		self._act_struct = None # set in setSchema()
+		self._stepobs_struct = None
+		self._resetobs_struct = None
+		self._pending_lat = 0.0 # stashed by stepSendLastActDur()
+		self._rlcomm = ClientCommPoint(ipbaselinespart,portbaselinespart,
+									   transport = transport,
+									   sockbufsize = sockbufsize,
+									   shmsize = shmsize)
 		
 		if self._verbose:
 			print("Agent decoupler enabled.")
-		
-		res = self._rlcomm.begin()
-		if len(res) > 0:
-			raise RuntimeError("Error starting connection with RL. " + res)
-		
+
+		self._rlcomm.begin() # raises CommError if the RL side is unreachable
+
 		if self._verbose:
 			print("Agent decoupler connected to RL decoupler")
-		
-					
+
+
+	def setSchema(self, actsize: int, obssize: int):
+		"""
+		Enable the fixed-schema fast path: actions are flat sequences of
+		ACTSIZE floats and observations flat sequences of OBSSIZE floats.
+		The RL side must call its setSchema() with the same sizes. After
+		this, actions arrive from readWhatToDo() as flat tuples of floats
+		and observations are sent as packed float32 vectors instead of
+		serialized dictionaries.
+		"""
+		self._act_struct,self._stepobs_struct, \
+			self._resetobs_struct = _schemaStructs(actsize,obssize)
+
+
+
 	def __del__(self):
-	
-		res = self._rlcomm.end()
-		if len(res) > 0:
-			raise RuntimeError("Error stopping connection with RL: " + res)
+
+		try:
+			self._rlcomm.end()
+		except CommError as e:
+			print("Error stopping connection with RL: " + str(e))
 		if self._verbose:
 			print("Connection with RL finished.")
 
  	
-	def readWhatToDo(self, timeout:float = 10.0): 	
-		""" 
+	def readWhatToDo(self, timeout:float = 10.0, waittime:float = 0.0):
+		"""
 		Call this method at each iteration of the agent spin loop if you need
-		to receive new commands from the RL side. 
+		to receive new commands from the RL side.
 		It returns a tuple with an indicator plus possibly some data received
-		(or None if none). If nothing to do is pending in the communications 
-		channel, return None, thus this method is not blocking except when there
-		are data in the channel.
+		(or None if none). If nothing to do is pending in the communications
+		channel after WAITTIME seconds, return None; with the default
+		WAITTIME of 0.0 the method does not block at all except when there
+		are data in the channel. Passing a WAITTIME close to the agent
+		control timestep turns the spin-loop poll into a single blocking
+		wait that wakes as soon as a command arrives, instead of burning CPU
+		re-checking the channel.
 		Depending on the indicator, you must:
 			REC_ACTION_SEND_OBS : take the action from the second element of the
 								  tuple, start its execution, return the actual
@@ -196,41 +373,71 @@ class AgentSide:
 					to finish the experiment (the comms are closed automatically
 					in this case).
 		TIMEOUT is the maximum time to take for the reading of the channel.
-		This method can raise RuntimeError if any error occurs in comms.
+		This method can raise CommError if any error occurs in comms.
 		"""
-		
-		if not self._rlcomm.checkDataToRead():
+
+		# one wait on the comm point's persistent selector: the fd stays
+		# registered across calls, so this probe allocates nothing per spin
+		if not self._rlcomm.waitDataToRead(waittime):
 			return None
-		
+
 		# read last (pending) step()/reset() msg and then proceed accordingly
-		res,ind = self._rlcomm.readData(timeout) 
+		ind = self._rlcomm.readData(timeout)
 		# read a dict: { 'stepkind' : 'reset', 'step' or 'finish' ,
 		#			      'action' : <action> if any}
-		if len(res) > 0:
-			raise RuntimeError("Error receiving what-to-do from RL: " + res)
-				
-		if ind["stepkind"] == "step":
-			return (AgentSide.WhatToDo.REC_ACTION_SEND_OBS, ind["action"])
-		elif ind["stepkind"] == "reset":
-			return (AgentSide.WhatToDo.RESET_SEND_OBS, None)
-		elif ind["stepkind"] == "finish":
-			return (AgentSide.WhatToDo.FINISH, None)
-		else:
-			raise(ValueError("Unknown what-to-do indicator [" + 
+
+		if isinstance(ind,(bytes,bytearray)): # fixed-schema fast path
+			if self._act_struct is None:
+				raise RuntimeError("Received a fixed-schema message but no "
+								   "schema is set; call setSchema() first")
+			if ind[0] == _RAW_STEP:
+				return (_WTD_STEP,self._act_struct.unpack(ind)[1:])
+			raise(ValueError("Unknown raw what-to-do indicator [" +
+							 str(ind[0]) + "]"))
+
+		kind = AgentSide._KIND.get(ind["stepkind"])
+		if kind is None:
+			raise(ValueError("Unknown what-to-do indicator [" +
 							 ind["stepkind"] + "]"))
+		return (kind, ind.get("action"))
+
+	def readAllPending(self, timeout:float = 10.0):
+		"""
+		Drain every command currently pending in the communications channel
+		and return them as a list of the same (indicator, data) tuples that
+		readWhatToDo() produces, oldest first (an empty list if nothing is
+		pending). Never blocks waiting for new commands.
+		Useful when the agent falls behind the RL side: instead of handling
+		one backlogged command per spin iteration, the caller gets the whole
+		backlog at once and can, e.g., execute only the freshest action. A
+		FINISH indicator ends the drain, since nothing meaningful follows it.
+		TIMEOUT bounds the reading of each already-pending command.
+		This method can raise CommError if any error occurs in comms.
+		"""
+
+		pending = []
+		while self._rlcomm.checkDataToRead():
+			wtd = self.readWhatToDo(timeout)
+			if wtd is None:
+				break
+			pending.append(wtd)
+			if wtd[0] is _WTD_FINISH:
+				break
+		return pending
+
 
 	def stepSendLastActDur(self, lat:float):
 		"""
 		Call this method after receiving a REC_ACTION_SEND_OBS and starting the
-		action, being LAT the actual time during which the action previous to 
-		that one was executed (before being substituted by the one in 
+		action, being LAT the actual time during which the action previous to
+		that one was executed (before being substituted by the one in
 		REC_ACTION_SEND_OBS).
-		This method can raise RuntimeError if any error occurs in comms.
+		The duration is not transmitted here: it is stored and travels with the
+		observation in the next stepSendObs() call, so the step response costs
+		a single message on the wire.
 		"""
 
-		res = self._rlcomm.sendData(dict({"lat": lat}))
-		if len(res) > 0:
-			raise RuntimeError("Error sending lat to RL. " + res)	
+		self._pending_lat = lat
 
 
 	def stepSendObs(self, obs, agenttime:float = 0.0, rew:float = 0.0):		
@@ -241,12 +448,23 @@ class AgentSide:
 		reward is calculated at the RL side, but in some situations it could be
 		interesting to calculate it at the agent side).
 		Agenttime is the time when the agent got the observation.
-		This method can raise RuntimeError if any error occurs in comms.
+		The last action duration given to stepSendLastActDur() travels in this
+		same message.
+		This method can raise CommError if any error occurs in comms.
 		"""
-		
-		res = self._rlcomm.sendData(dict({"obs":obs,"rew":rew,"ato":agenttime}))
-		if len(res) > 0:
-			raise RuntimeError("Error sending observation/reward to RL. " + res)	
+
+		raw = None
+		if self._stepobs_struct is not None:
+			try:
+				raw = self._stepobs_struct.pack(_RAW_STEPOBS,self._pending_lat,
+												rew,agenttime,*obs)
+			except (TypeError,struct.error):
+				raw = None # obs does not match the schema; send as dict
+		if raw is not None:
+			self._rlcomm.sendRaw(raw)
+		else:
+			self._rlcomm.sendData(dict({"lat":self._pending_lat,"obs":obs,
+										"rew":rew,"ato":agenttime}))
 
 					
 	def resetSendObs(self,obs,agenttime = 0.0):
@@ -254,11 +472,28 @@ class AgentSide:
 		Call this method if readWhatToDo() returned RESET_SEND_OBS to send back
 		the first observation (OBS, a dictionary) got after an episode reset,
 		along with the time (of the agent) when that observation was gathered.
-		This method can raise RuntimeError if any error occurs in comms.
+		This method can raise CommError if any error occurs in comms.
 		"""
 
-		res = self._rlcomm.sendData({"obs":obs,"ato":agenttime})
-		if len(res) > 0:
-			raise RuntimeError("Error sending observation to RL. " + res)	
+		raw = None
+		if self._resetobs_struct is not None:
+			try:
+				raw = self._resetobs_struct.pack(_RAW_RESETOBS,agenttime,*obs)
+			except (TypeError,struct.error):
+				raw = None # obs does not match the schema; send as dict
+		if raw is not None:
+			self._rlcomm.sendRaw(raw)
+		else:
+			self._rlcomm.sendData({"obs":obs,"ato":agenttime})
  	
  			 	
+
+
+# WhatToDo members pre-bound at module level: Enum attribute access goes
+# through the EnumMeta descriptor machinery, so the hot spin-loop paths use
+# these instead of looking the members up per call. Comparisons against
+# members are identity checks either way (Enum members are singletons), so
+# callers lose nothing by keeping the Enum in the public API.
+_WTD_STEP = AgentSide.WhatToDo.REC_ACTION_SEND_OBS
+_WTD_RESET = AgentSide.WhatToDo.RESET_SEND_OBS
+_WTD_FINISH = AgentSide.WhatToDo.FINISH